@@ -1,16 +1,20 @@
 # code.py — command demo over Bristlemouth (RAW RX), QT Py RP2040, CircuitPython 9.2.0
 import time
 import json
-import binascii
 import board
 import neopixel
 from bm_serial import BristlemouthSerial
+from bm_log import BMLogger, hexstr, DEBUG, INFO
 
 # -------------------- Settings --------------------
 LED_TOPIC = "device/led"   # BM -> MCU command topic
 ACK_PRINT = True           # live bus message (spotter/printf)
 ACK_LOG   = True           # write to Spotter SD log (spotter/fprintf)
 ACK_LOG_FILE = "led_cmd.log"
+DEBUG_REPL = False         # print per-message RX dumps to the REPL
+
+# ACK_LOG lines are batched into spotter/fprintf frames by the logger
+log = BMLogger(filename=ACK_LOG_FILE, level=DEBUG if DEBUG_REPL else INFO, repl=DEBUG_REPL)
 
 # -------------------- LED setup -------------------
 pixel = neopixel.NeoPixel(board.NEOPIXEL, 1)
@@ -69,12 +73,9 @@ def ack(bm: BristlemouthSerial, msg: str):
             bm.spotter_print(msg)
         except Exception:
             pass
-    # SD log on Spotter
+    # SD log on Spotter (batched, flushed from the main loop)
     if ACK_LOG:
-        try:
-            bm.spotter_log(ACK_LOG_FILE, msg)
-        except Exception:
-            pass
+        log.info("%s", msg)
 
 def parse_led_command(js: dict):
     """
@@ -110,22 +111,13 @@ def on_pub(node_id, msg_type, version, topic_len, topic, data_len, data):
     # Visual nudge for RX (transient)
     led_flash_transient(led_colors["transmitting"], on_ms=30, off_ms=20, count=2)
 
-    # REPL debug
-    print("=== BM PUB RECEIVED ===")
-    print("Node ID:    0x{:016X}".format(node_id))
-    print("Type:       {}".format(msg_type))
-    print("Version:    {}".format(version))
-    print("Topic:      {}".format(topic))
-    print("Data len:   {}".format(data_len))
+    # REPL debug (formatted only when DEBUG_REPL is on)
+    log.debug("PUB node=0x%016X type=%d ver=%d topic=%s len=%d hex=%s",
+              node_id, msg_type, version, topic, data_len, hexstr(data))
 
     text = safe_decode_text(data)
-    if text is None:
-        print("Data (text): <non-UTF8>")
-    else:
+    if text is not None:
         text = text.rstrip("\x00\r\n")
-        print("Data (text):", text)
-    print("Data (hex):", binascii.hexlify(data).decode())
-    print("=======================")
 
     if text is None:
         ack(bm_instance, "LED ERR: non-UTF8 payload on {}".format(topic))
@@ -143,24 +135,24 @@ def on_pub(node_id, msg_type, version, topic_len, topic, data_len, data):
         msg = "LED ACK: blink color={} on_ms={} off_ms={} count={}".format(
             color_name, on_ms, off_ms, count
         )
-        print(msg); ack(bm_instance, msg)
+        ack(bm_instance, msg)
         led_blink_then_restore(color, on_ms=on_ms, off_ms=off_ms, count=count)
         return
 
     if mode == "on":
         msg = "LED ACK: on color={}".format(color_name)
-        print(msg); ack(bm_instance, msg)
+        ack(bm_instance, msg)
         led_set(color)
         return
 
     if mode == "off":
         msg = "LED ACK: off"
-        print(msg); ack(bm_instance, msg)
+        ack(bm_instance, msg)
         led_set(led_colors["off"])
         return
 
     msg = "LED ERR: unknown command '{}'".format(js.get("led"))
-    print(msg); ack(bm_instance, msg)
+    ack(bm_instance, msg)
 
 # -------------------- Main ------------------------
 bm_instance = None
@@ -172,12 +164,14 @@ def main():
 
     bm_instance = BristlemouthSerial()   # RAW-RX bm_serial handles receive as a single frame
     bm_instance.bristlemouth_sub(LED_TOPIC, on_pub)
+    log.bm = bm_instance
 
     last_heartbeat = time.monotonic()
     led_set(led_colors["off"])  # start off
 
     while True:
         bm_instance.bristlemouth_process(0.25)
+        log.service()
 
         # Non-destructive heartbeat every 2s (brief blue flash, then restore)
         now = time.monotonic()
@@ -0,0 +1,39 @@
+# build_mpy.py — host-side: precompile lib/*.py to .mpy for the CIRCUITPY drive
+# .mpy files import faster and skip the on-device compile step, which also
+# avoids the RAM spike of parsing the source at boot.
+#
+#   python3 build_mpy.py [--mpy-cross PATH] [--out dist]
+#
+# mpy-cross must match the CircuitPython major version on the board (9.x):
+# download it from https://adafruit-circuit-python.s3.amazonaws.com/index.html?prefix=bin/mpy-cross/
+# Then copy dist/lib/*.mpy into the board's lib folder (and delete the .py
+# copies there, .py wins over .mpy when both exist).
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mpy-cross", default="mpy-cross")
+    ap.add_argument("--out", default="dist")
+    args = ap.parse_args()
+
+    out_dir = os.path.join(args.out, "lib")
+    os.makedirs(out_dir, exist_ok=True)
+    failed = 0
+    for src in sorted(glob.glob(os.path.join("lib", "*.py"))):
+        dst = os.path.join(out_dir, os.path.basename(src)[:-3] + ".mpy")
+        try:
+            subprocess.run([args.mpy_cross, "-o", dst, src], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print("FAIL %s: %s" % (src, e))
+            failed += 1
+            continue
+        print("%-28s %6d B -> %6d B" % (src, os.path.getsize(src), os.path.getsize(dst)))
+    sys.exit(1 if failed else 0)
+
+
+main()
@@ -0,0 +1,67 @@
+# import_profile.py — boot-time cost of each bm_* module (CircuitPython 9.x)
+# Copy to the CIRCUITPY drive as code.py (next to lib/ with .py or .mpy files).
+# For each module it reports the import time and the heap it kept
+# (gc.mem_free() before/after). The first SUB frame is sent right after
+# bm_serial is imported, before any optional module, so its power-on time is
+# what a single-topic node pays. Modules are imported in the order below;
+# dependencies imported earlier (bm_store before bm_config) are not counted again.
+import gc
+import time
+
+MODULES = [
+    "bm_serial",    # core: every node needs this
+    "bm_types",
+    "bm_cobs",
+    "bm_store",
+    "bm_config",
+    "bm_log",
+    "bm_trace",
+    "bm_sample",
+    "bm_capture",
+]
+
+def mem_free():
+    f = getattr(gc, "mem_free", None)  # not on CPython
+    return f() if f else 0
+
+def now_ms():
+    return time.monotonic_ns() / 1000000
+
+def import_one(name):
+    gc.collect()
+    free0 = mem_free()
+    t0 = now_ms()
+    try:
+        __import__(name)
+    except ImportError as e:
+        print("%-12s  not installed (%s)" % (name, e))
+        return False
+    dt = now_ms() - t0
+    gc.collect()
+    free1 = mem_free()
+    print("%-12s %9.1f %10d %10d" % (name, dt, free0 - free1, free1))
+    return True
+
+def main():
+    boot_ms = now_ms()  # time since power-on / soft reload
+    gc.collect()
+    start_free = mem_free()
+    print("boot +%.0f ms, mem_free %d B" % (boot_ms, start_free))
+    print("%-12s %9s %10s %10s" % ("module", "import_ms", "heap_B", "free_B"))
+
+    # Time to first SUB: what a single-topic node pays before it can receive
+    # (core only, measured before any optional module is imported)
+    if import_one(MODULES[0]):
+        from bm_serial import BristlemouthSerial
+        t0 = now_ms()
+        bm = BristlemouthSerial()
+        bm.bristlemouth_sub("device/test", lambda *a: None)
+        t1 = now_ms()
+        print("first SUB sent at +%.0f ms (init+SUB %.1f ms)" % (t1, t1 - t0))
+
+    for name in MODULES[1:]:
+        import_one(name)
+    gc.collect()
+    print("total kept by bm_*: %d B, mem_free %d B" % (start_free - mem_free(), mem_free()))
+
+main()
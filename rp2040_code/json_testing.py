@@ -1,16 +1,21 @@
 # code.py — LED + Config via TAP routing only (no duplicate handlers)
-import time, json, os, binascii
+import time, json, math
 import board, neopixel
 from bm_serial import BristlemouthSerial
-from bm_store import ensure_dir, read_json, write_json_atomic
+from bm_store import ensure_dir, fs_is_rw, sync_json
+from bm_config import VersionedConfig
+from bm_log import BMLogger, DEBUG, INFO
+from bm_sample import SamplingPipeline, check_rates
+from bm_trace import Tracer, PhaseTimer, now_ms
 
 # -------------------- Topics --------------------
 LED_TOPIC        = "device/led"
 CFG_GET_TOPIC    = "device/config/get"
 CFG_SET_TOPIC    = "device/config/set"
+TRACE_TOPIC      = "device/trace/get"
+SUB_TOPICS       = (LED_TOPIC, CFG_GET_TOPIC, CFG_SET_TOPIC, TRACE_TOPIC)
 
 # -------------------- Files & defaults -----------
-CONFIG_DIR        = "/config"
 SYSTEM_JSON_PATH  = "/config/system.json"
 SYSTEM_DEFAULTS = {
     "sd_high_hz": 25,
@@ -20,6 +25,22 @@ SYSTEM_DEFAULTS = {
     "imu_enabled": True,
 }
 
+# -------------------- Sampling --------------------
+SAMPLE_MODE = "high"     # "high" -> sd_high_hz/tx_high_hz, "low" -> sd_low_hz/tx_low_hz
+SAMPLE_TX   = False      # True: send summaries via spotter/transmit-data (uses Spotter telemetry)
+RX_IDLE_S   = 0.02       # UART idle gap that ends a frame (the sampler runs during the wait)
+
+def emulated_sensor():
+    # Stand-in for an IMU read: slow sine plus a little wobble
+    t = time.monotonic()
+    return math.sin(t * 0.5) + 0.05 * math.sin(t * 7.0)
+
+def on_summary(payload):
+    if SAMPLE_TX:
+        bm.spotter_tx(payload)
+    else:
+        log.debug("[SAMPLE] summary %d B", len(payload))
+
 # -------------------- LED setup -------------------
 pixel = neopixel.NeoPixel(board.NEOPIXEL, 1)
 pixel.brightness = 0.3
@@ -46,9 +67,11 @@ def led_flash_transient(color, on_ms=60, off_ms=40, count=2):
 
 # -------------------- Debugging ---------------------
 DEBUG_REPL = True
-def dbg(*a):
-    if DEBUG_REPL:
-        print(*a)
+TRACE_ACKS = True   # append trace id + rx/dispatch/queue timings to every ACK
+CAPTURE_PATH = None # e.g. "/logs/bm.bmcap": record raw UART traffic, appended per boot (device-write mode only)
+LOG_FILE = "json_testing.log"
+# Records are formatted only if emitted; flushed in batches to spotter/fprintf
+log = BMLogger(filename=LOG_FILE, level=DEBUG if DEBUG_REPL else INFO, repl=DEBUG_REPL)
 
 def same_topic(rx: str, expect: str) -> bool:
     # tolerate trailing NULs, spaces, CR/LF weirdness
@@ -65,22 +88,14 @@ def safe_text(b):
         except Exception: return None
 
 def ack(bm: BristlemouthSerial, msg: str):
-    dbg("[ACK]", msg)               # REPL confirmation
+    if TRACE_ACKS:
+        msg += tracer.stamp()       # "" outside of a received command
+    log.debug("[ACK] %s", msg)      # REPL confirmation
     try:
         bm.spotter_print(msg)       # what your BM console shows
     except Exception:
         pass
 
-
-def fs_is_rw():
-    p = "/.rw_test.tmp"
-    try:
-        with open(p, "w") as f: f.write("x")
-        os.remove(p)
-        return True
-    except Exception:
-        return False
-
 # -------------------- Handlers (called from TAP) --
 def handle_led(bm, payload_text):
     if payload_text is None:
@@ -95,15 +110,30 @@ def handle_led(bm, payload_text):
         pixel[0] = latched_color; time.sleep(0.05)
     ack(bm, "LED ACK: blinked")
 
-def handle_cfg_get(bm):
+def parse_json_obj(payload_text):
+    """JSON object from a text payload; {} for empty, None if unparseable."""
+    body = payload_text.strip().rstrip("\x00\r\n")
+    if not body:
+        return {}
+    obj = json.loads(body)
+    return obj if isinstance(obj, dict) else None
+
+def handle_cfg_get(bm, payload_text):
+    # {} -> full config; {"v":N} -> "NM" or only keys changed since N
+    known = None
+    if payload_text is not None:
+        try:
+            req = parse_json_obj(payload_text)
+            if req and "v" in req:
+                known = int(req["v"])
+        except Exception:
+            pass  # unparseable request -> full reply
     try:
-        cfg = read_json(SYSTEM_JSON_PATH, SYSTEM_DEFAULTS)
-        # was: json.dumps(cfg, separators=(",", ":"), sort_keys=True)
-        pretty = json.dumps(cfg)
-        dbg("CFG GET ->", pretty)
-        ack(bm, "CFG: " + pretty)
+        reply = config.get_reply(known)
+        log.debug("CFG GET (v=%s) -> %s", known, reply)
+        ack(bm, "CFG " + reply)
     except Exception as e:
-        dbg("CFG GET ERROR:", e)
+        log.error("CFG GET ERROR: %s", e)
         ack(bm, "CFG ERR: read failed")
 
 
@@ -111,103 +141,145 @@ def handle_cfg_set(bm, payload_text, fs_rw):
     if payload_text is None:
         ack(bm, "CFG ERR: non-UTF8"); return
     try:
-        incoming = json.loads(payload_text.strip().rstrip("\x00\r\n"))
+        incoming = parse_json_obj(payload_text)
+        if incoming is None:
+            raise ValueError("not a JSON object")
     except Exception as e:
-        dbg("CFG SET JSON ERROR:", e, "payload:", payload_text)
+        log.warn("CFG SET JSON ERROR: %s payload: %r", e, payload_text)
         ack(bm, "CFG ERR: bad JSON"); return
 
-    cfg = read_json(SYSTEM_JSON_PATH, SYSTEM_DEFAULTS)
-    for k in SYSTEM_DEFAULTS.keys():
-        if k in incoming:
-            cfg[k] = incoming[k]
-
     if not fs_rw:
         ack(bm, "CFG ERR: FS is read-only (host-edit mode)"); return
 
-    ok = write_json_atomic(SYSTEM_JSON_PATH, cfg)
+    # All keys in one message are applied together under one version bump
+    try:
+        ok, applied = config.apply(incoming)
+    except ValueError as e:
+        log.warn("CFG SET rejected: %s", e)
+        ack(bm, "CFG ERR: %s" % e); return
     if ok:
-        # was: json.dumps(cfg, separators=(",", ":"), sort_keys=True)
-        pretty = dumps_sorted(cfg)
-        dbg("CFG SET ->", pretty)
-        ack(bm, "CFG SAVED: " + pretty)
+        if applied and sampler is not None:
+            sampler.apply_config(config.cfg)  # new rates take effect immediately
+        log.debug("CFG SET v=%d applied=%s", config.version, applied)
+        ack(bm, "CFG SAVED v=%d %s" % (config.version, ",".join(applied) or "-"))
     else:
         ack(bm, "CFG ERR: write failed")
 
-def dumps_sorted(d: dict) -> str:
-    # Manual key order; avoids unsupported json kwargs
-    keys = list(d.keys())
-    keys.sort()
-    parts = []
-    for k in keys:
-        parts.append('"%s": %s' % (k, json.dumps(d[k])))
-    return "{" + ", ".join(parts) + "}"
 
+def handle_trace_get(bm):
+    lines = tracer.report()
+    if not lines:
+        ack(bm, "TRACE: no samples"); return
+    for line in lines:
+        ack(bm, "TRACE " + line)
 
 
 # -------------------- TAP router ------------------
 def tap_router(node_id, msg_type, version, topic_len, topic, data_len, data):
+    global first_rx_ms
+    if first_rx_ms is None:
+        first_rx_ms = now_ms()
+        log.info("first message at +%d ms", first_rx_ms)
     # Always show what we got (helps diagnose)
     text = safe_text(data)
-    short = (text[:100] + "…") if (text and len(text) > 100) else (text or "")
-    dbg(f"[RX] topic={topic!r} ({data_len}B) payload={short!r}")
-    dbg(f"[ROUTER] eq_get={topic == CFG_GET_TOPIC}, eq_set={topic == CFG_SET_TOPIC}")
-    dbg(f"same_get={same_topic(topic, CFG_GET_TOPIC)}, same_set={same_topic(topic, CFG_SET_TOPIC)}")
+    log.debug("[RX] topic=%r (%dB) payload=%.100r", topic, data_len, text)
     if same_topic(topic, LED_TOPIC):
         handle_led(bm, text)
         return
 
     if same_topic(topic, CFG_GET_TOPIC):
-        # ACK immediately so you see it on the BM console, even if anything below fails
-        ack(bm, "CFG GET SEEN")
-        handle_cfg_get(bm)
+        handle_cfg_get(bm, text)
         return
 
     if same_topic(topic, CFG_SET_TOPIC):
-        # ACK immediately so you see it on the BM console
-        ack(bm, "CFG SET SEEN")
+        # One reply per SET: "CFG SAVED v=<n> <keys>" or "CFG ERR: ..."
         handle_cfg_set(bm, text, FS_RW)
         return
 
+    if same_topic(topic, TRACE_TOPIC):
+        handle_trace_get(bm)
+        return
+
 
 
 # -------------------- Main ------------------------
 bm = None
 FS_RW = False
-
-def main():
-    global bm, FS_RW
-    print("Starting BM LED + Config (TAP-routed)…")
+config = None
+sampler = None
+tracer = Tracer()
+first_rx_ms = None   # time-to-first-message (ms since power-on)
+
+def startup():
+    """
+    Fast boot: no probe writes, config written only if its content changed,
+    all SUB frames in one UART write. Returns the PhaseTimer.
+    """
+    global bm, FS_RW, config
+    timer = PhaseTimer()
     FS_RW = fs_is_rw()
     print("[MODE]", "Device-write (RW)" if FS_RW else "Host-edit (RO)")
+    timer.mark("fs")
 
-    if FS_RW:
-        ensure_dir(CONFIG_DIR)
-        cur = read_json(SYSTEM_JSON_PATH, SYSTEM_DEFAULTS)
-        write_json_atomic(SYSTEM_JSON_PATH, cur)
-        try: print("[boot] ls /config ->", os.listdir("/config"))
-        except Exception as e: print("[boot] ls /config ERROR:", e)
+    cfg, wrote = sync_json(SYSTEM_JSON_PATH, SYSTEM_DEFAULTS, write=FS_RW)
+    # Held in RAM; GET is served without touching flash
+    config = VersionedConfig(SYSTEM_JSON_PATH, SYSTEM_DEFAULTS, persist=FS_RW, cfg=cfg,
+                             validate=check_rates)
+    print("[boot] config v=%d%s" % (config.version, " (written)" if wrote else ""))
+    timer.mark("config")
 
     bm = BristlemouthSerial()
-    # Send SUB frames so the network forwards these topics to us
-    bm.bristlemouth_sub(LED_TOPIC, lambda *a, **k: None)       # no-op
-    bm.bristlemouth_sub(CFG_GET_TOPIC, lambda *a, **k: None)   # no-op
-    bm.bristlemouth_sub(CFG_SET_TOPIC, lambda *a, **k: None)   # no-op
-
+    log.bm = bm
+    bm.tracer = tracer   # stamps RX/dispatch/TX, syncs clock from RTC_SET
+    if CAPTURE_PATH and FS_RW:
+        from bm_capture import CaptureWriter
+        ensure_dir(CAPTURE_PATH.rsplit("/", 1)[0])
+        bm.capture = CaptureWriter(CAPTURE_PATH)
+        print("[boot] capturing UART traffic to", CAPTURE_PATH)
     # Single TAP: the router
-    try:
-        bm.bristlemouth_tap(tap_router)
-    except Exception:
-        pass
+    bm.bristlemouth_tap(tap_router)
+    timer.mark("uart")
+
+    # SUB frames so the network forwards these topics to us, in one write
+    bm.bristlemouth_sub_batch(SUB_TOPICS)
+    timer.mark("sub")
+    return timer
+
+def main():
+    global sampler
+    print("Starting BM LED + Config (TAP-routed)…")
+    timer = startup()
+    boot = timer.report()
+    print("[boot]", boot)
+    log.info("%s", boot)
+
+    sampler = SamplingPipeline(emulated_sensor, config.cfg, tx_fn=on_summary, mode=SAMPLE_MODE)
+    if sampler.error:
+        # e.g. a bad rate edited in on the host: run without sampling instead of crashing
+        log.warn("sampling off: %s", sampler.error)
 
     last = time.monotonic()
     led_set(led_colors["off"])
 
-    while True:
-        bm.bristlemouth_process(0.25)
-        now = time.monotonic()
-        if now - last > 2.0:
-            last = now
-            led_flash_transient(led_colors["working"], 15, 0, 1)
-        time.sleep(0.01)
+    try:
+        while True:
+            # The sampler is polled inside the RX idle wait, so it keeps its rate
+            bm.bristlemouth_process(RX_IDLE_S, idle_fn=sampler.poll)
+            sampler.poll()
+            log.service()
+            now = time.monotonic()
+            if now - last > 2.0:
+                last = now
+                if bm.capture is not None:
+                    bm.capture.flush()
+                led_flash_transient(led_colors["working"], 15, 0, 1)
+    except Exception as e:
+        # Fault: push recent history to the REPL and the Spotter SD log
+        log.error("main loop fault: %r", e)
+        log.dump()
+        log.flush(max_frames=log.capacity)
+        if bm.capture is not None:
+            bm.capture.close()
+        raise
 
 main()
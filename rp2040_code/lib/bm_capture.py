@@ -0,0 +1,238 @@
+# /lib/bm_capture.py — binary capture + replay of BM UART traffic
+#
+# Capture: attach a CaptureWriter (bm.capture = CaptureWriter("/logs/bm.cap"))
+# and BristlemouthSerial records every raw RX chunk, every TX frame and the
+# end of each RX burst (what bristlemouth_process() treats as one frame).
+#
+# File format (little-endian):
+#   header : b"BMCP" + version u8 (1) + reserved u8
+#   record : kind u8, dt_us u32 (since previous record), len u16, data[len]
+#            kind 0 = RX chunk, 1 = TX frame, 2 = RX burst end (len 0)
+# The file is appended to by default and every CaptureWriter starts with a
+# new header, so a file holds one session per boot and a reboot after a fault
+# keeps the trace that led up to it. read_capture() reports each header as a
+# REC_SESSION record.
+#
+# Replay: replay(path, bm, speed) feeds the captured RX bursts back through
+# bm.bristlemouth_process() via a ReplayUART, at real time (1.0), scaled
+# (e.g. 10.0) or maximum speed (0), and returns throughput numbers.
+import struct
+import time
+
+try:
+    _now_ns = time.monotonic_ns
+except AttributeError:
+    def _now_ns():
+        return int(time.monotonic() * 1000000000)
+
+MAGIC = b"BMCP"
+VERSION = 1
+REC_RX = 0
+REC_TX = 1
+REC_RX_END = 2
+REC_SESSION = 3   # not stored: read_capture() yields one per header
+
+_HDR = MAGIC + bytes((VERSION, 0))
+_REC_FMT = "<BIH"
+_REC_LEN = struct.calcsize(_REC_FMT)
+
+
+def _now_us() -> int:
+    return _now_ns() // 1000
+
+
+class CaptureWriter:
+    def __init__(self, f, bufsize: int = 1024, append: bool = True) -> None:
+        """
+        f      : path or an already open binary file
+        bufsize: records are batched in RAM and written in chunks of this size
+        append : add a new session to the end of the file at path ("ab");
+                 False truncates it ("wb")
+        """
+        if isinstance(f, str):
+            self._f = open(f, "ab" if append else "wb")
+            self._own = True
+        else:
+            self._f = f
+            self._own = False
+        self._buf = bytearray(bufsize)
+        self._mv = memoryview(self._buf)
+        self._pos = 0
+        self._last_us = _now_us()
+        self.records = 0
+        self._f.write(_HDR)
+
+    def record(self, kind: int, data=b"", dt_us: int = None) -> None:
+        """dt_us overrides the measured gap (for building synthetic captures)."""
+        now = _now_us()
+        dt = now - self._last_us if dt_us is None else dt_us
+        self._last_us = now
+        if dt > 0xFFFFFFFF:
+            dt = 0xFFFFFFFF
+        n = len(data)
+        if n > 0xFFFF:
+            data = data[:0xFFFF]
+            n = 0xFFFF
+
+        if self._pos + _REC_LEN + n > len(self._buf):
+            self.flush()
+        if _REC_LEN + n > len(self._buf):
+            # Larger than the buffer: write straight through
+            self._f.write(struct.pack(_REC_FMT, kind, dt, n))
+            self._f.write(data)
+        else:
+            struct.pack_into(_REC_FMT, self._buf, self._pos, kind, dt, n)
+            self._pos += _REC_LEN
+            self._mv[self._pos:self._pos + n] = data
+            self._pos += n
+        self.records += 1
+
+    def flush(self) -> None:
+        if self._pos:
+            self._f.write(self._mv[:self._pos])
+            self._pos = 0
+        try:
+            self._f.flush()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.flush()
+        if self._own:
+            self._f.close()
+
+
+def read_capture(f):
+    """
+    Yield (t_us, kind, data) per record; t_us is relative to capture start and
+    carries on across sessions. Each header (one per boot) yields
+    (t_us, REC_SESSION, b"").
+    """
+    own = isinstance(f, str)
+    if own:
+        f = open(f, "rb")
+    try:
+        t = 0
+        first = True
+        while True:
+            kind = f.read(1)
+            if not kind:
+                return
+            if kind[0] == MAGIC[0]:
+                # Header: a record kind is never b"B"
+                hdr = kind + f.read(len(_HDR) - 1)
+                if len(hdr) < len(_HDR) or hdr[:4] != MAGIC:
+                    if first:
+                        raise ValueError("not a BM capture file")
+                    return  # garbage / truncated tail
+                if hdr[4] != VERSION:
+                    raise ValueError("unsupported capture version %d" % hdr[4])
+                first = False
+                yield t, REC_SESSION, b""
+                continue
+            if first:
+                raise ValueError("not a BM capture file")
+            rec = kind + f.read(_REC_LEN - 1)
+            if len(rec) < _REC_LEN:
+                return
+            kind, dt, n = struct.unpack(_REC_FMT, rec)
+            data = f.read(n) if n else b""
+            if len(data) < n:
+                return  # truncated tail (e.g. power loss mid-write)
+            t += dt
+            yield t, kind, data
+    finally:
+        if own:
+            f.close()
+
+
+def rx_bursts(records):
+    """Group RX chunks into bursts: [(t_us of first chunk, [chunk, ...]), ...]."""
+    bursts = []
+    cur = None
+    for t, kind, data in records:
+        if kind == REC_RX:
+            if cur is None:
+                cur = (t, [])
+            cur[1].append(data)
+        elif kind in (REC_RX_END, REC_SESSION) and cur is not None:
+            bursts.append(cur)  # a reboot also ends a burst
+            cur = None
+    if cur is not None:
+        bursts.append(cur)
+    return bursts
+
+
+class ReplayUART:
+    """Stands in for busio.UART: serves one queued burst, then None (idle)."""
+
+    def __init__(self) -> None:
+        self._chunks = []
+        self.tx_bytes = 0
+        self.tx_frames = 0
+
+    def feed(self, chunks) -> None:
+        self._chunks = list(chunks)
+        self._chunks.reverse()  # pop() from the end
+
+    def read(self, n: int):
+        if not self._chunks:
+            return None
+        b = self._chunks.pop()
+        if len(b) > n:
+            self._chunks.append(b[n:])
+            b = b[:n]
+        return b
+
+    def write(self, b) -> int:
+        self.tx_bytes += len(b)
+        self.tx_frames += 1
+        return len(b)
+
+
+def replay(path, bm, speed: float = 1.0) -> dict:
+    """
+    Feed a capture's RX bursts through bm.bristlemouth_process().
+    speed: 1.0 = real time, >1 faster, 0 = as fast as possible.
+    bm.uart is replaced by a ReplayUART for the duration.
+    Returns counters: bursts, rx_bytes, tx_frames, tx_bytes,
+    busy_s (inside bristlemouth_process), wall_s, max_lag_s (behind schedule).
+    """
+    bursts = rx_bursts(read_capture(path))
+    uart = ReplayUART()
+    saved_uart = bm.uart
+    bm.uart = uart
+
+    rx_bytes = 0
+    busy_ns = 0
+    max_lag_ns = 0
+    start = _now_ns()
+    try:
+        if bursts:
+            t0_us = bursts[0][0]
+            for t_us, chunks in bursts:
+                if speed > 0:
+                    due = start + int((t_us - t0_us) * 1000 / speed)
+                    wait = due - _now_ns()
+                    if wait > 0:
+                        time.sleep(wait / 1000000000)
+                    elif -wait > max_lag_ns:
+                        max_lag_ns = -wait
+                for c in chunks:
+                    rx_bytes += len(c)
+                uart.feed(chunks)
+                t = _now_ns()
+                bm.bristlemouth_process(0)  # burst is served back-to-back, then idle
+                busy_ns += _now_ns() - t
+    finally:
+        bm.uart = saved_uart
+
+    return {
+        "bursts": len(bursts),
+        "rx_bytes": rx_bytes,
+        "tx_frames": uart.tx_frames,
+        "tx_bytes": uart.tx_bytes,
+        "busy_s": busy_ns / 1000000000,
+        "wall_s": (_now_ns() - start) / 1000000000,
+        "max_lag_s": max_lag_ns / 1000000000,
+    }
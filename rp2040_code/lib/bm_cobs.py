@@ -0,0 +1,38 @@
+# /lib/bm_cobs.py — COBS decode for RX (only loaded with BristlemouthSerial(rx_cobs=True))
+
+
+def cobs_decode(in_bytes) -> bytes:
+    """Decode one COBS block (without the trailing 0x00 delimiter)."""
+    out_bytes = bytearray()
+    idx = 0
+    n = len(in_bytes)
+    while idx < n:
+        code = in_bytes[idx]
+        if code == 0:
+            raise ValueError("zero byte in COBS data")
+        end = idx + code
+        if end > n:
+            raise ValueError("truncated COBS block")
+        out_bytes += in_bytes[idx + 1:end]
+        idx = end
+        if code < 0xFF and idx < n:
+            out_bytes.append(0)
+    return bytes(out_bytes)
+
+
+def cobs_split_decode(burst) -> list:
+    """Split a burst on 0x00 delimiters and decode each frame; bad frames are dropped."""
+    frames = []
+    start = 0
+    n = len(burst)
+    while start < n:
+        end = burst.find(b"\x00", start)
+        if end < 0:
+            end = n
+        if end > start:
+            try:
+                frames.append(cobs_decode(burst[start:end]))
+            except ValueError:
+                pass
+        start = end + 1
+    return frames
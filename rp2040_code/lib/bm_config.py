@@ -0,0 +1,142 @@
+# /lib/bm_config.py — versioned config with delta-only GET/SET replies
+#
+# Every applied change bumps a single version counter and stamps the changed
+# keys with it. A GET that carries a known version gets back "NM" (not
+# modified) or only the keys changed since then; a SET reports the new
+# version and the applied key names instead of echoing the whole config.
+#
+# Version state lives in a sidecar file next to the config (system.json ->
+# system.meta.json) so system.json itself stays a plain key/value dict. When
+# the sidecar is missing or does not match the config (edited on the host,
+# possibly with the FS read-only so it can never be rewritten), the version is
+# derived from the content hash: the same content always maps to the same
+# version and an edit maps to a different one, so a GET never answers NM for
+# content the client has not seen.
+import json
+
+from bm_store import read_json, write_json_atomic, dumps_compact, content_crc
+
+
+def _content_version(crc: int) -> int:
+    # 29 bits keeps it a small int on CircuitPython; never 0
+    return 1 + (crc & 0x1FFFFFFF)
+
+
+def _read_meta(path: str) -> dict:
+    # A missing sidecar is normal (first boot, host-edit mode): no warning
+    try:
+        with open(path, "r") as f:
+            meta = json.load(f)
+        return meta if isinstance(meta, dict) else {}
+    except Exception:
+        return {}
+
+
+class VersionedConfig:
+    def __init__(
+            self,
+            path: str,
+            defaults: dict,
+            meta_path: str = None,
+            persist: bool = False,
+            cfg: dict = None,
+            validate=None
+    ) -> None:
+        """
+        persist : FS is writable — (re)write the sidecar if it is missing or stale,
+                  and the default for apply()
+        cfg     : already loaded config (skips re-reading path)
+        validate: fn(new_cfg) -> None if acceptable, else a reason; checked by
+                  apply() before anything is written
+        """
+        self.path = path
+        self.defaults = defaults
+        self.validate = validate
+        self.persist = persist
+        self.meta_path = meta_path or (path.rsplit(".", 1)[0] + ".meta.json")
+
+        self.cfg = cfg if cfg is not None else read_json(path, defaults)
+        meta = _read_meta(self.meta_path)
+        crc = content_crc(self.cfg)
+        self._kv = {}
+        if meta.get("crc") == crc:
+            self.version = int(meta.get("v", 1))
+            kv = meta.get("kv", {})
+            for k in self.cfg:
+                self._kv[k] = int(kv.get(k, self.version))
+        else:
+            # No sidecar, or the config was edited behind our back: every key changed
+            self.version = _content_version(crc)
+            for k in self.cfg:
+                self._kv[k] = self.version
+            if persist:
+                self._save_meta()
+
+    # -------- Queries --------
+
+    def changed_since(self, version: int) -> dict:
+        """Keys whose value changed after 'version'."""
+        return {k: self.cfg[k] for k in self.cfg if self._kv.get(k, self.version) > version}
+
+    def get_reply(self, known_version=None) -> str:
+        """
+        Reply body for a GET:
+          no/unknown version -> "v=<n> {full config}"
+          current version    -> "v=<n> NM"
+          older version      -> "v=<n> {changed keys only}"
+        """
+        if known_version is None or known_version < 0 or known_version > self.version:
+            return "v=%d %s" % (self.version, dumps_compact(self.cfg))
+        if known_version == self.version:
+            return "v=%d NM" % self.version
+        delta = self.changed_since(known_version)
+        return "v=%d %s" % (self.version, dumps_compact(delta))
+
+    # -------- Updates --------
+
+    def apply(self, incoming: dict, persist: bool = None):
+        """
+        Apply a batch of keys (only keys present in defaults are accepted;
+        unchanged values are skipped). All changes in one call share one
+        version bump. Returns (ok, applied_keys); ok is False if the write
+        failed. Raises ValueError if validate rejects the result (nothing is
+        applied or written). persist defaults to the constructor's persist.
+        """
+        if persist is None:
+            persist = self.persist
+        applied = []
+        for k in self.defaults:
+            if k in incoming and self.cfg.get(k) != incoming[k]:
+                applied.append(k)
+        if not applied:
+            return True, applied
+
+        new_cfg = dict(self.cfg)
+        for k in applied:
+            new_cfg[k] = incoming[k]
+        if self.validate is not None:
+            err = self.validate(new_cfg)
+            if err is not None:
+                raise ValueError(err)
+        new_version = self.version + 1
+
+        if persist:
+            if not write_json_atomic(self.path, new_cfg):
+                return False, []
+
+        self.cfg = new_cfg
+        self.version = new_version
+        for k in applied:
+            self._kv[k] = new_version
+
+        if persist:
+            self._save_meta()
+        applied.sort()
+        return True, applied
+
+    def _save_meta(self) -> bool:
+        return write_json_atomic(self.meta_path, {
+            "v": self.version,
+            "kv": self._kv,
+            "crc": content_crc(self.cfg),
+        })
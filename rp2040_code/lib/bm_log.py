@@ -0,0 +1,222 @@
+# /lib/bm_log.py — lazy, leveled logger on top of BristlemouthSerial.spotter_log()
+#
+# Records are kept unformatted (fmt + args) in fixed-size ring buffers: one
+# for records sent to Spotter (>= bus_level) and a separate one for REPL /
+# dump()-only records, so a DEBUG flood never overwrites an unsent ACK line.
+# Formatting only happens when a record is actually emitted: on flush()
+# to 'spotter/fprintf', on REPL echo, or on dump() after a fault.
+# With the level above DEBUG, a log.debug(...) call is one compare + return.
+import time
+
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+OFF = 100
+
+_LEVEL_NAMES = {DEBUG: "D", INFO: "I", WARN: "W", ERROR: "E"}
+
+
+class hexstr:
+    """Lazy hex view of a payload: hexlify only runs if the record is emitted."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        import binascii
+        return binascii.hexlify(self.data).decode()
+
+
+class _Ring:
+    """Preallocated ring of unformatted records (parallel lists, no per-record objects)."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.t = [0.0] * capacity
+        self.lv = bytearray(capacity)
+        self.fmt = [None] * capacity
+        self.args = [None] * capacity
+        self.head = 0   # next slot to write
+        self.count = 0  # records held (<= capacity)
+
+    def put(self, level: int, fmt: str, args) -> int:
+        i = self.head
+        self.t[i] = time.monotonic()
+        self.lv[i] = level
+        self.fmt[i] = fmt
+        self.args[i] = args
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        return i
+
+    def index_from_newest(self, k: int) -> int:
+        # k = 0 is the newest record
+        return (self.head - 1 - k) % self.capacity
+
+
+class BMLogger:
+    def __init__(
+            self,
+            bm=None,
+            filename: str = "bm.log",
+            level: int = INFO,
+            capacity: int = 32,
+            flush_interval_s: float = 1.0,
+            max_frame_bytes: int = 200,
+            max_frames_per_flush: int = 2,
+            repl: bool = False,
+            bus_level: int = INFO,
+            local_capacity: int = 16
+    ) -> None:
+        """
+        bm                  : BristlemouthSerial used for 'spotter/fprintf' (None = RAM/REPL only)
+        filename            : Spotter SD log file name
+        level               : records below this level are dropped before any formatting
+        capacity            : ring size for records sent to Spotter; oldest are overwritten
+        flush_interval_s    : minimum time between flushes from service()
+        max_frame_bytes     : max text bytes batched into one fprintf frame
+        max_frames_per_flush: cap on frames sent per flush (rest waits for the next one)
+        repl                : also print each record to the REPL as it is logged
+        bus_level           : records below this level stay in RAM/REPL and are never
+                              sent to Spotter (keeps DEBUG off the bus and the SD card)
+        local_capacity      : ring size for those RAM/REPL-only records
+        """
+        self.bm = bm
+        self.filename = filename
+        self.level = level
+        self.flush_interval_s = flush_interval_s
+        self.max_frame_bytes = max_frame_bytes
+        self.max_frames_per_flush = max_frames_per_flush
+        self.repl = repl
+        self.bus_level = bus_level
+
+        self.capacity = capacity
+        self._bus = _Ring(capacity)           # >= bus_level, flushed to Spotter
+        self._local = _Ring(local_capacity)   # < bus_level, REPL / dump() only
+        self._pending = 0   # newest bus records not yet sent to Spotter
+        self.dropped = 0    # unsent bus records overwritten before a flush
+        self._last_flush = time.monotonic()
+
+    # -------- Logging API --------
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, fmt: str, *args) -> None:
+        if level < self.level:
+            return
+        if level >= self.bus_level:
+            ring = self._bus
+            if self._pending < ring.capacity:
+                self._pending += 1
+            else:
+                self.dropped += 1
+        else:
+            ring = self._local
+        i = ring.put(level, fmt, args)
+        if self.repl:
+            print(self._format(ring, i))
+
+    def debug(self, fmt: str, *args) -> None:
+        if DEBUG >= self.level:
+            self.log(DEBUG, fmt, *args)
+
+    def info(self, fmt: str, *args) -> None:
+        if INFO >= self.level:
+            self.log(INFO, fmt, *args)
+
+    def warn(self, fmt: str, *args) -> None:
+        if WARN >= self.level:
+            self.log(WARN, fmt, *args)
+
+    def error(self, fmt: str, *args) -> None:
+        if ERROR >= self.level:
+            self.log(ERROR, fmt, *args)
+
+    # -------- Output --------
+
+    def service(self) -> int:
+        """
+        Call from the main loop. Flushes pending records if flush_interval_s
+        has elapsed. Returns the number of frames sent.
+        """
+        if not self._pending:
+            return 0
+        if (time.monotonic() - self._last_flush) < self.flush_interval_s:
+            return 0
+        return self.flush()
+
+    def flush(self, max_frames: int = None) -> int:
+        """
+        Format pending records and send them as batched 'spotter/fprintf' frames
+        (several newline-joined records per frame). Returns frames sent.
+        """
+        self._last_flush = time.monotonic()
+        if self.bm is None:
+            self._pending = 0
+            return 0
+        if max_frames is None:
+            max_frames = self.max_frames_per_flush
+
+        sent = 0
+        batch = []
+        size = 0
+        while self._pending and sent < max_frames:
+            line = self._format(self._bus, self._bus.index_from_newest(self._pending - 1))
+            if batch and size + len(line) + 1 > self.max_frame_bytes:
+                self._send(batch)
+                sent += 1
+                batch = []
+                size = 0
+                if sent >= max_frames:
+                    break
+            batch.append(line)
+            size += len(line) + 1
+            self._pending -= 1
+        if batch:
+            self._send(batch)
+            sent += 1
+        return sent
+
+    def dump(self, n: int = None, out=print) -> None:
+        """
+        Emit the most recent n records (default: all held) from both rings,
+        oldest first, through out(). Includes records already flushed — use
+        after a fault.
+        """
+        recs = []
+        for ring in (self._bus, self._local):
+            for k in range(ring.count):
+                i = ring.index_from_newest(k)
+                recs.append((ring.t[i], ring, i))
+        recs.sort(key=lambda r: r[0])
+        if n is not None and n < len(recs):
+            recs = recs[len(recs) - n:]
+        if self.dropped:
+            out("[bm_log] %d record(s) dropped before flush" % self.dropped)
+        for _, ring, i in recs:
+            out(self._format(ring, i))
+
+    # -------- Internal helpers --------
+
+    def _format(self, ring, i: int) -> str:
+        fmt = ring.fmt[i]
+        args = ring.args[i]
+        if args:
+            try:
+                msg = fmt % args
+            except Exception:
+                msg = "%s %r" % (fmt, args)
+        else:
+            msg = fmt
+        return "%.3f %s %s" % (ring.t[i], _LEVEL_NAMES.get(ring.lv[i], "?"), msg)
+
+    def _send(self, lines) -> None:
+        try:
+            self.bm.spotter_log(self.filename, "\n".join(lines))
+        except Exception:
+            pass  # never let logging take down the caller
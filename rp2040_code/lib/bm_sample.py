@@ -0,0 +1,294 @@
+# /lib/bm_sample.py — multi-rate sensor sampling with incremental aggregation
+#
+# Reads a sensor at sd_<mode>_hz on an absolute deadline clock, keeps the raw
+# samples in preallocated array windows, and updates min/max/mean/variance
+# one sample at a time (Welford). Every sd_hz/tx_hz samples the window is
+# summarised, packed and handed to tx_fn (e.g. bm.spotter_tx), then reset.
+#
+# Rates come from the SYSTEM_DEFAULTS keys: sd_high_hz, sd_low_hz,
+# tx_high_hz, tx_low_hz, imu_enabled. Call apply_config() after a config
+# change and set_mode("high"/"low") to switch rates at runtime.
+#
+# Summary payload (little-endian):
+#   seq u16, mode u8 (0=high, 1=low), count u16,
+#   then per channel: min f32, max f32, mean f32, variance f32
+import struct
+import time
+from array import array
+
+try:
+    _now_ns = time.monotonic_ns
+except AttributeError:
+    def _now_ns():
+        return int(time.monotonic() * 1000000000)
+
+_NS_PER_S = 1000000000
+MAX_SD_HZ = 100      # what the main loop can service on an RP2040
+MAX_WINDOW = 1024    # samples per summary (sd_hz / tx_hz), bounds window RAM
+_MODES = ("high", "low")
+_HDR_FMT = "<HBH"
+_HDR_LEN = struct.calcsize(_HDR_FMT)
+_CH_FMT = "<ffff"
+_CH_LEN = struct.calcsize(_CH_FMT)
+
+
+def check_rates(cfg: dict):
+    """
+    None if the rate keys in cfg are usable, else a short reason.
+    Pass as VersionedConfig(validate=check_rates) so bad rates never persist.
+    """
+    for mode in _MODES:
+        sd_key = "sd_%s_hz" % mode
+        tx_key = "tx_%s_hz" % mode
+        for k in (sd_key, tx_key):
+            v = cfg.get(k)
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or not v > 0:
+                return "%s must be a positive number" % k
+        if cfg[sd_key] > MAX_SD_HZ:
+            return "%s above %d" % (sd_key, MAX_SD_HZ)
+        if cfg[sd_key] / cfg[tx_key] > MAX_WINDOW:
+            return "%s/%s above %d" % (sd_key, tx_key, MAX_WINDOW)
+    return None
+
+
+class DeadlineClock:
+    """
+    Tick n is due at t0 + n / hz, computed from the tick count rather than by
+    adding a period to the previous deadline, so rounding never accumulates.
+    All deadline math is integer (rate held in mHz): CircuitPython floats are
+    30-bit and cannot hold a ns timestamp. Ticks missed by a whole period or
+    more are skipped (counted), not bursted.
+    """
+
+    def __init__(self, hz: float, now_ns: int = None) -> None:
+        self.skipped = 0
+        self.set_rate(hz, now_ns)
+
+    def set_rate(self, hz: float, now_ns: int = None) -> None:
+        mhz = int(hz * 1000 + 0.5)
+        if mhz <= 0:
+            raise ValueError("rate must be >= 0.001 Hz")
+        self.hz = hz
+        self._mhz = mhz
+        self._t0 = _now_ns() if now_ns is None else now_ns
+        self._n = 0
+        self.next_ns = self._t0
+
+    def _deadline(self, n: int) -> int:
+        return self._t0 + n * _NS_PER_S * 1000 // self._mhz
+
+    def due(self, now_ns: int) -> bool:
+        return now_ns >= self.next_ns
+
+    def advance(self, now_ns: int) -> int:
+        """Consume the due tick; returns how late it was serviced (ns)."""
+        late = now_ns - self.next_ns
+        self._n += 1
+        nxt = self._deadline(self._n)
+        if now_ns >= nxt:
+            missed = (now_ns - nxt) * self._mhz // (_NS_PER_S * 1000) + 1
+            self._n += missed
+            self.skipped += missed
+            nxt = self._deadline(self._n)
+        self.next_ns = nxt
+        return late
+
+    def sleep_until_due(self) -> None:
+        wait = self.next_ns - _now_ns()
+        if wait > 0:
+            time.sleep(wait / _NS_PER_S)
+
+
+class Window:
+    """Preallocated sample store + running min/max/mean/variance."""
+
+    def __init__(self, size: int, typecode: str = "f") -> None:
+        self.typecode = typecode
+        # Zero-filled from a raw buffer: no temporary list of size elements
+        self.buf = array(typecode, bytes(size * struct.calcsize(typecode)))
+        self.reset()
+
+    def reset(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, x: float) -> None:
+        n = self.n
+        if n < len(self.buf):
+            self.buf[n] = x
+        if n == 0:
+            self.min = self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+        n += 1
+        d = x - self.mean
+        self.mean += d / n
+        self._m2 += d * (x - self.mean)
+        self.n = n
+
+    def variance(self) -> float:
+        """Population variance of the samples added since reset()."""
+        return self._m2 / self.n if self.n else 0.0
+
+    def samples(self):
+        """Raw samples held in this window (memoryview, no copy)."""
+        return memoryview(self.buf)[:min(self.n, len(self.buf))]
+
+
+class SamplingPipeline:
+    def __init__(
+            self,
+            read_fn,
+            cfg: dict,
+            tx_fn=None,
+            channels: int = 1,
+            mode: str = "high"
+    ) -> None:
+        """
+        read_fn : () -> float (channels == 1) or sequence of floats
+        cfg     : dict with sd_high_hz, sd_low_hz, tx_high_hz, tx_low_hz, imu_enabled
+        tx_fn   : fn(payload) called with each packed summary (e.g. bm.spotter_tx);
+                  the payload bytearray is reused, copy it if you keep it
+        """
+        self.read_fn = read_fn
+        self.tx_fn = tx_fn
+        self.channels = channels
+        self.mode = mode
+        self.windows = []
+        self.enabled = False
+        self.sd_hz = self.tx_hz = None
+        self.error = None   # reason the last config's rates were refused
+        self._tx_buf = bytearray(_HDR_LEN + channels * _CH_LEN)
+        self.seq = 0
+
+        # Counters (for jitter / throughput checks)
+        self.samples = 0
+        self.max_late_ns = 0
+        self._late_sum_ns = 0
+
+        self.clock = DeadlineClock(1)
+        self.apply_config(cfg)
+
+    # -------- Rate control --------
+
+    def apply_config(self, cfg: dict) -> None:
+        """
+        (Re)load rates from config; safe to call while running. Invalid rates
+        are refused (see self.error) and the previous rates are kept.
+        """
+        self.cfg = cfg
+        was_enabled = self.enabled
+        self.enabled = bool(cfg.get("imu_enabled", True))
+        self._set_rates(force=self.enabled and not was_enabled)
+
+    def set_mode(self, mode: str) -> None:
+        if mode not in _MODES:
+            raise ValueError("mode must be 'high' or 'low'")
+        if mode != self.mode:
+            self.mode = mode
+            self._set_rates(force=True)
+
+    def _set_rates(self, force: bool = False) -> None:
+        err = check_rates(self.cfg)
+        if err is not None:
+            # Refuse, never raise: keep the last good rates, or stay off at boot
+            self.error = err
+            if self.sd_hz is None:
+                self.enabled = False
+            return
+        self.error = None
+        sd_hz = float(self.cfg["sd_%s_hz" % self.mode])
+        tx_hz = float(self.cfg["tx_%s_hz" % self.mode])
+        if not force and sd_hz == self.sd_hz and tx_hz == self.tx_hz:
+            return  # unrelated config change: keep the clock and window running
+        self.sd_hz = sd_hz
+        self.tx_hz = tx_hz
+        self.decimation = max(1, int(self.sd_hz / self.tx_hz + 0.5))
+
+        # Grow windows only when a new rate needs more room (never on the sample path)
+        if not self.windows or len(self.windows[0].buf) < self.decimation:
+            self.windows = [Window(self.decimation) for _ in range(self.channels)]
+        else:
+            for w in self.windows:
+                w.reset()  # a partial window at the old rate is dropped
+        self.clock.set_rate(self.sd_hz)
+
+    # -------- Sampling --------
+
+    def poll(self, now_ns: int = None) -> bool:
+        """
+        Non-blocking: take one sample if the next deadline has passed.
+        Call as often as possible from the main loop. Returns True if sampled.
+        """
+        if not self.enabled:
+            return False
+        if now_ns is None:
+            now_ns = _now_ns()
+        if not self.clock.due(now_ns):
+            return False
+
+        late = self.clock.advance(now_ns)
+        self._late_sum_ns += late
+        if late > self.max_late_ns:
+            self.max_late_ns = late
+
+        value = self.read_fn()
+        if self.channels == 1:
+            self.windows[0].add(value)
+        else:
+            for i in range(self.channels):
+                self.windows[i].add(value[i])
+        self.samples += 1
+
+        if self.windows[0].n >= self.decimation:
+            self._emit()
+        return True
+
+    def run_for(self, seconds: float) -> None:
+        """Blocking loop (sleeping between deadlines) — for tests and benches."""
+        end = _now_ns() + int(seconds * _NS_PER_S)
+        while _now_ns() < end:
+            self.clock.sleep_until_due()
+            self.poll()
+
+    def mean_late_ns(self) -> float:
+        return self._late_sum_ns / self.samples if self.samples else 0.0
+
+    # -------- Output --------
+
+    def pack_summary(self) -> bytearray:
+        buf = self._tx_buf
+        w0 = self.windows[0]
+        struct.pack_into(_HDR_FMT, buf, 0, self.seq & 0xFFFF, _MODES.index(self.mode), w0.n)
+        off = _HDR_LEN
+        for w in self.windows:
+            struct.pack_into(_CH_FMT, buf, off, w.min, w.max, w.mean, w.variance())
+            off += _CH_LEN
+        return buf
+
+    def _emit(self) -> None:
+        payload = self.pack_summary()
+        self.seq += 1
+        for w in self.windows:
+            w.reset()
+        if self.tx_fn is not None:
+            try:
+                self.tx_fn(payload)
+            except Exception:
+                pass  # keep sampling even if TX fails
+
+
+def unpack_summary(payload: bytes, channels: int = 1):
+    """Inverse of pack_summary: (seq, mode, count, [(min, max, mean, var), ...])."""
+    seq, mode, count = struct.unpack_from(_HDR_FMT, payload, 0)
+    stats = []
+    off = _HDR_LEN
+    for _ in range(channels):
+        stats.append(struct.unpack_from(_CH_FMT, payload, off))
+        off += _CH_LEN
+    return seq, _MODES[mode], count, stats
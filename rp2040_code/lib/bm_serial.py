@@ -1,59 +1,66 @@
 # bm_serial.py — CircuitPython 9.x, Adafruit QT Py RP2040
-# RAW RX only (incoming UART bytes are already a complete BM frame).
+# RAW RX by default (incoming UART bytes are already a complete BM frame).
 # TX still uses COBS framing + trailing 0x00 as per BM convention.
+#
+# Core only: SUB/PUB/print/log TX and PUB dispatch. Everything else is an
+# optional module that is imported only when used:
+#   bm_types   full BM_SERIAL_* message type table
+#   bm_cobs    COBS decode (rx_cobs=True)
+#   bm_config  versioned config      bm_trace   latency tracing + stats
+#   bm_log     logger                bm_capture capture / replay
+#   bm_sample  sampling pipeline
 
-import board
-import busio
 import time
 
+try:
+    from micropython import const
+except ImportError:  # CPython (host-side tools)
+    def const(x):
+        return x
+
+# Only the message types the core needs; underscore names are inlined by the
+# compiler and take no RAM. The full table lives in bm_types.py.
+_PUB = const(0x02)
+_RTC_SET = const(0x07)
+
+_SUB_HDR = b"\x03\x00\x00\x00"  # [type=0x03, 0x00, CRC(lo), CRC(hi)]
+_TOPIC_TX = b"spotter/transmit-data"
+_TOPIC_FPRINTF = b"spotter/fprintf"
+_TOPIC_PRINTF = b"spotter/printf"
+_RESERVED8 = bytes(8)
+
 
 class BristlemouthSerial:
-    # Message type constants (align with Pi implementation)
-    BM_SERIAL_DEBUG = 0x00
-    BM_SERIAL_ACK = 0x01
-    BM_SERIAL_PUB = 0x02
-    BM_SERIAL_SUB = 0x03
-    BM_SERIAL_UNSUB = 0x04
-    BM_SERIAL_LOG = 0x05
-    BM_SERIAL_NET_MSG = 0x06
-    BM_SERIAL_RTC_SET = 0x07
-    BM_SERIAL_SELF_TEST = 0x08
-    BM_SERIAL_NETWORK_INFO = 0x09
-    BM_SERIAL_REBOOT_INFO = 0x0A
-    BM_SERIAL_DFU_START = 0x30
-    BM_SERIAL_DFU_CHUNK = 0x31
-    BM_SERIAL_DFU_RESULT = 0x32
-    BM_SERIAL_CFG_GET = 0x40
-    BM_SERIAL_CFG_SET = 0x41
-    BM_SERIAL_CFG_VALUE = 0x42
-    BM_SERIAL_CFG_COMMIT = 0x43
-    BM_SERIAL_CFG_STATUS_REQ = 0x44
-    BM_SERIAL_CFG_STATUS_RESP = 0x45
-    BM_SERIAL_CFG_DEL_REQ = 0x46
-    BM_SERIAL_CFG_DEL_RESP = 0x47
-    BM_SERIAL_CFG_CLEAR_REQ = 0x48
-    BM_SERIAL_CFG_CLEAR_RESP = 0x49
-    BM_SERIAL_DEVICE_INFO_REQ = 0x50
-    BM_SERIAL_DEVICE_INFO_REPLY = 0x51
-    BM_SERIAL_RESOURCE_REQ = 0x52
-    BM_SERIAL_RESOURCE_REPLY = 0x53
-    BM_SERIAL_NODE_ID_REQ = 0x60
-    BM_SERIAL_NODE_ID_REPLY = 0x61
-    BM_SERIAL_BAUD_RATE_REQ = 0x70
-    BM_SERIAL_BAUD_RATE_REPLY = 0x71
+    # BM_SERIAL_* message types are in bm_types.py, so importing this module
+    # stays small. Import them from there; bm.BM_SERIAL_* on an instance still
+    # works (see __getattr__), BristlemouthSerial.BM_SERIAL_* does not.
 
     def __init__(
             self,
             uart=None,
             node_id: int = 0xC0FFEEEEF0CACC1A,
             baudrate: int = 115200,
-            rx_bufsize: int = 512
+            rx_bufsize: int = 512,
+            rx_cobs: bool = False
     ) -> None:
-        self.node_id = node_id
+        """
+        rx_cobs: RX bursts are COBS-framed (0x00-delimited) rather than RAW;
+                 loads bm_cobs and splits/decodes each burst into frames.
+        """
+        self.node_id = node_id  # property: also builds the PUB header
         self.sub_cbs = []  # callbacks: fn(node_id, type, version, topic_len, topic, data_len, data)
-        self._rx_buf = bytearray(rx_bufsize)
+        self.tracer = None  # optional bm_trace.Tracer (latency stamps + RTC sync)
+        self.capture = None  # optional bm_capture.CaptureWriter (raw RX/TX recording)
+        self._rx_bufsize = rx_bufsize
+        self._rx_cobs = None
+        if rx_cobs:
+            from bm_cobs import cobs_split_decode
+            self._rx_cobs = cobs_split_decode
 
         if uart is None:
+            # Imported here so a host-side uart (e.g. bm_capture.ReplayUART) works off-device
+            import board
+            import busio
             try:
                 self.uart = busio.UART(
                     board.TX, board.RX,
@@ -66,6 +73,23 @@ class BristlemouthSerial:
         else:
             self.uart = uart
 
+    @property
+    def node_id(self) -> int:
+        return self._node_id
+
+    @node_id.setter
+    def node_id(self, node_id: int) -> None:
+        self._node_id = node_id
+        # [type=0x02, 0x00, CRC(lo), CRC(hi)] + node_id + [type=1, version=1], rebuilt only here
+        self._pub_hdr = b"\x02\x00\x00\x00" + node_id.to_bytes(8, "little") + b"\x01\x01"
+
+    def __getattr__(self, name):
+        # Back-compat: bm.BM_SERIAL_* without keeping 32 attributes on the class
+        if name.startswith("BM_SERIAL_"):
+            import bm_types
+            return getattr(bm_types, name)
+        raise AttributeError(name)
+
     # -------- Public API --------
 
     def bristlemouth_sub(self, topic: str, fn):
@@ -75,20 +99,35 @@ class BristlemouthSerial:
         """
         if fn not in self.sub_cbs:
             self.sub_cbs.append(fn)
+        return self._uart_write(self._sub_frame(topic))
 
-        topic_b = topic.encode("utf-8")
-        packet = (
-                bytearray.fromhex("03000000")  # [type=0x03, 0x00, CRC(lo), CRC(hi)]
-                + len(topic_b).to_bytes(2, "little")  # topic length (u16 LE)
-                + topic_b
-        )
-        return self._uart_write(self._finalize_packet(packet))
+    def bristlemouth_sub_batch(self, topics, fn=None):
+        """
+        Emit SUB frames for all topics in a single UART write (faster boot than
+        one bristlemouth_sub() per topic). Registers fn if given; use
+        bristlemouth_tap() for a router instead.
+        """
+        if fn is not None and fn not in self.sub_cbs:
+            self.sub_cbs.append(fn)
+        frames = b""
+        for topic in topics:
+            frames += self._sub_frame(topic)
+        return self._uart_write(frames)
+
+    def bristlemouth_tap(self, fn):
+        """
+        Register a callback for every received PUB without emitting a SUB frame
+        (use with bristlemouth_sub() for the topics themselves, then route by topic).
+        Callback signature: fn(node_id, type, version, topic_len, topic, data_len, data)
+        """
+        if fn not in self.sub_cbs:
+            self.sub_cbs.append(fn)
 
     def spotter_tx(self, data: bytes):
         """
         Publish raw data to 'spotter/transmit-data'.
         """
-        topic = b"spotter/transmit-data"
+        topic = _TOPIC_TX
         packet = (
                 self._get_pub_header()
                 + len(topic).to_bytes(2, "little")
@@ -102,14 +141,14 @@ class BristlemouthSerial:
         """
         Publish a log line to 'spotter/fprintf'.
         """
-        topic = b"spotter/fprintf"
+        topic = _TOPIC_FPRINTF
         fn_b = filename.encode("utf-8")
         data_b = data.encode("utf-8")
         packet = (
                 self._get_pub_header()
                 + len(topic).to_bytes(2, "little")
                 + topic
-                + (b"\x00" * 8)  # reserved
+                + _RESERVED8  # reserved
                 + len(fn_b).to_bytes(2, "little")
                 + (len(data_b) + 1).to_bytes(2, "little")
                 + fn_b
@@ -124,12 +163,12 @@ class BristlemouthSerial:
         Uses topic 'spotter/printf' and mirrors the same payload shape
         as spotter_log() (zero filename length + data length + newline).
         """
-        topic = b"spotter/printf"
+        topic = _TOPIC_PRINTF
         packet = (
                 self._get_pub_header()
                 + len(topic).to_bytes(2, "little")
                 + topic
-                + (b"\x00" * 8)  # reserved
+                + _RESERVED8  # reserved
                 + (0).to_bytes(2, "little")  # filename length = 0
                 + (len(data) + 1).to_bytes(2, "little")  # data length (+ newline)
                 + data.encode("utf-8")
@@ -137,44 +176,76 @@ class BristlemouthSerial:
         )
         return self._uart_write(self._finalize_packet(packet))
 
-    def bristlemouth_process(self, timeout_s: float = 0.5) -> None:
+    def bristlemouth_process(self, timeout_s: float = 0.5, idle_fn=None) -> None:
         """
         Poll UART for up to timeout_s and dispatch any PUB frames to subscribed callbacks.
-        RX is RAW (no COBS) — the incoming burst is a complete BM frame.
+        RX is RAW (no COBS) — the incoming burst is a complete BM frame —
+        unless the instance was created with rx_cobs=True.
+        idle_fn: called about every 1 ms while the UART is idle (e.g. a sampler's
+                 poll) so periodic work keeps its rate; reads then only take
+                 bytes already received and never block.
         """
-        frames = self._read_burst_until_idle(timeout_s)
+        frames = self._read_burst_until_idle(timeout_s, idle_fn)
+        if self._rx_cobs is not None and frames:
+            frames = self._rx_cobs(frames[0])
         for frame in frames:
             if len(frame) < 4:
                 continue
             msg_type = frame[0]
             payload = frame[4:]  # after [type, reserved, crc_lo, crc_hi]
-            if msg_type == self.BM_SERIAL_PUB:
+            if msg_type == _PUB:
                 self._process_publish_message(payload)
+            elif msg_type == _RTC_SET and self.tracer is not None:
+                try:
+                    self.tracer.sync_rtc(payload)
+                except Exception:
+                    pass  # malformed RTC frame
             # Extend for other message types if needed
 
     # -------- Internal helpers --------
 
     def _uart_write(self, b: bytes) -> int:
-        return self.uart.write(b)
+        if self.capture is not None:
+            self.capture.record(1, b)  # REC_TX
+        n = self.uart.write(b)
+        if self.tracer is not None:
+            self.tracer.on_tx_done()
+        return n
 
-    def _read_burst_until_idle(self, idle_timeout: float = 0.5):
+    def _read_burst_until_idle(self, idle_timeout: float = 0.5, idle_fn=None):
         """
         RAW RX: read bytes until 'idle_timeout' of silence, return as a single frame.
         """
         start = time.monotonic()
         data = bytearray()
+        uart = self.uart
         while True:
-            b = self.uart.read(len(self._rx_buf))  # bytes or None
+            if idle_fn is None:
+                b = uart.read(self._rx_bufsize)  # bytes or None
+            else:
+                # busio read() waits out its timeout for a short count; ask only for what is there
+                n = getattr(uart, "in_waiting", self._rx_bufsize)
+                b = uart.read(min(n, self._rx_bufsize)) if n else None
             if b:
+                if not data and self.tracer is not None:
+                    self.tracer.on_rx()  # first byte of the burst
+                if self.capture is not None:
+                    self.capture.record(0, b)  # REC_RX
                 data.extend(b)
                 start = time.monotonic()
             else:
                 if (time.monotonic() - start) >= idle_timeout:
                     break
-                time.sleep(0.01)
+                if idle_fn is None:
+                    time.sleep(0.01)
+                else:
+                    idle_fn()
+                    time.sleep(0.001)
 
         if not data:
             return []
+        if self.capture is not None:
+            self.capture.record(2)  # REC_RX_END: burst boundary for replay
         return [bytes(data)]
 
     def _process_publish_message(self, payload: bytes) -> None:
@@ -208,59 +279,71 @@ class BristlemouthSerial:
             data = payload[end_topic:]
             data_len = len(data)
 
+            tracer = self.tracer
+            if tracer is not None:
+                tracer.begin(topic)
             for cb in self.sub_cbs:
                 try:
                     cb(node_id, msg_type, version, topic_len, topic, data_len, data)
                 except Exception:
                     pass  # keep dispatcher alive
+            if tracer is not None:
+                tracer.end()
 
         except Exception:
             pass  # swallow malformed payloads
 
     def _finalize_packet(self, packet: bytearray) -> bytes:
-        checksum = self._crc(0, packet)
+        checksum = _crc(0, packet)
         packet[2] = checksum & 0xFF
         packet[3] = (checksum >> 8) & 0xFF
-        return self._cobs_encode(packet) + b"\x00"  # TX uses COBS + delimiter
+        return _cobs_encode(packet) + b"\x00"  # TX uses COBS + delimiter
 
-    def _get_pub_header(self) -> bytearray:
-        return (
-                bytearray.fromhex("02000000")
-                + self.node_id.to_bytes(8, "little")
-                + bytearray.fromhex("0101")
+    def _sub_frame(self, topic: str) -> bytes:
+        topic_b = topic.encode("utf-8")
+        packet = (
+                bytearray(_SUB_HDR)
+                + len(topic_b).to_bytes(2, "little")  # topic length (u16 LE)
+                + topic_b
         )
+        return self._finalize_packet(packet)
 
-    # ---------- COBS (TX only) ----------
-
-    def _cobs_encode(self, in_bytes: bytes) -> bytes:
-        final_zero = True
-        out_bytes = bytearray()
-        idx = 0
-        search_start_idx = 0
-        for in_char in in_bytes:
-            if in_char == 0:
-                final_zero = True
-                out_bytes.append(idx - search_start_idx + 1)
-                out_bytes += in_bytes[search_start_idx:idx]
-                search_start_idx = idx + 1
-            else:
-                if idx - search_start_idx == 0xFD:
-                    final_zero = False
-                    out_bytes.append(0xFF)
-                    out_bytes += in_bytes[search_start_idx: idx + 1]
-                    search_start_idx = idx + 1
-            idx += 1
-        if idx != search_start_idx or final_zero:
+    def _get_pub_header(self) -> bytearray:
+        return bytearray(self._pub_hdr)
+
+
+# ---------- COBS (TX only; decode lives in bm_cobs.py) ----------
+
+def _cobs_encode(in_bytes: bytes) -> bytes:
+    final_zero = True
+    out_bytes = bytearray()
+    idx = 0
+    search_start_idx = 0
+    for in_char in in_bytes:
+        if in_char == 0:
+            final_zero = True
             out_bytes.append(idx - search_start_idx + 1)
             out_bytes += in_bytes[search_start_idx:idx]
-        return bytes(out_bytes)
+            search_start_idx = idx + 1
+        else:
+            if idx - search_start_idx == 0xFD:
+                final_zero = False
+                out_bytes.append(0xFF)
+                out_bytes += in_bytes[search_start_idx: idx + 1]
+                search_start_idx = idx + 1
+        idx += 1
+    if idx != search_start_idx or final_zero:
+        out_bytes.append(idx - search_start_idx + 1)
+        out_bytes += in_bytes[search_start_idx:idx]
+    return bytes(out_bytes)
+
 
-    # ---------- CRC ----------
+# ---------- CRC ----------
 
-    def _crc(self, seed: int, src: bytes) -> int:
-        e, f = 0, 0
-        for i in src:
-            e = (seed ^ i) & 0xFF
-            f = e ^ ((e << 4) & 0xFF)
-            seed = (seed >> 8) ^ (((f << 8) & 0xFFFF) ^ ((f << 3) & 0xFFFF)) ^ (f >> 4)
-        return seed
+def _crc(seed: int, src: bytes) -> int:
+    e, f = 0, 0
+    for i in src:
+        e = (seed ^ i) & 0xFF
+        f = e ^ ((e << 4) & 0xFF)
+        seed = (seed >> 8) ^ (((f << 8) & 0xFFFF) ^ ((f << 3) & 0xFFFF)) ^ (f >> 4)
+    return seed
@@ -1,6 +1,42 @@
 # /lib/bm_store.py
 import os, json
 
+try:
+    from binascii import crc32
+except ImportError:
+    crc32 = None
+
+def fs_is_rw(path: str = "/") -> bool:
+    """True if running code may write to the filesystem. Checked without writing."""
+    try:
+        import storage  # CircuitPython: reflects storage.remount() in boot.py
+        return not storage.getmount(path).readonly
+    except ImportError:
+        pass
+    except Exception:
+        return False
+    try:
+        return not (os.statvfs(path)[8] & 1)  # f_flag & ST_RDONLY
+    except Exception:
+        return False
+
+def dumps_compact(d: dict, keys=None) -> str:
+    """Sorted, separator-free JSON object (CircuitPython json has no separators= kwarg)."""
+    if keys is None:
+        keys = list(d.keys())
+    keys = sorted(keys)
+    return "{" + ",".join('"%s":%s' % (k, json.dumps(d[k])) for k in keys) + "}"
+
+def content_crc(d: dict) -> int:
+    """Hash of a dict's content, independent of key order (crc32, else FNV-1a)."""
+    b = dumps_compact(d).encode("utf-8")
+    if crc32 is not None:
+        return crc32(b) & 0xFFFFFFFF
+    h = 0x811C9DC5
+    for c in b:
+        h = ((h ^ c) * 0x01000193) & 0xFFFFFFFF
+    return h
+
 def ensure_dir(path: str):
     """Create /config, /logs, etc. (idempotent)."""
     if not path or path == "/":
@@ -46,3 +82,27 @@ def write_json_atomic(path: str, obj: dict) -> bool:
         except Exception:
             pass
         return False
+
+def sync_json(path: str, defaults: dict, write: bool = True):
+    """
+    Load path and fill in any keys missing from defaults. Only writes when the
+    result differs from what is on flash (missing keys added) — a normal boot
+    with an up-to-date file does no flash writes. Returns (obj, wrote).
+    """
+    try:
+        with open(path, "r") as f:
+            cur = json.load(f)
+        if not isinstance(cur, dict):
+            raise ValueError("not a JSON object")
+    except Exception as e:
+        print(f"[bm_store] sync_json {path}: using defaults ({e})")
+        cur = None
+
+    obj = dict(defaults)
+    if cur is not None:
+        obj.update(cur)
+        if obj == cur:
+            return cur, False
+    if not write:
+        return obj, False
+    return obj, write_json_atomic(path, obj)
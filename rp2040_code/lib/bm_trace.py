@@ -0,0 +1,223 @@
+# /lib/bm_trace.py — end-to-end latency tracing for BM commands
+#
+# Attach to a BristlemouthSerial (bm.tracer = Tracer()) and every received PUB
+# gets a trace with these local stamps (ms):
+#   rx  first UART byte of the burst seen
+#   d   dispatch to the subscriber callbacks starts
+#   q   the handler's acknowledgement is queued (stamp() called)
+#   w   that acknowledgement's UART write returned
+#   h   the callbacks returned (handler end)
+# stamp() appends a compact " [t=<id> rx=<epoch ms> d=.. q=..]" suffix to the
+# ACK so it can be lined up with the Spotter console timestamps. The local
+# clock is synced from BM_SERIAL_RTC_SET frames; before the first sync rx is
+# reported as local monotonic ms ("rxm=").
+#
+# Per topic, the segments below keep a rolling window for percentiles:
+#   uart  rx -> d   (burst read + idle gap + parse)
+#   hand  d  -> q   (handler work before the ACK)
+#   tx    q  -> w   (ACK framing + UART write)
+#   body  d  -> h   (whole handler)
+#   total rx -> h
+import time
+from array import array
+
+try:
+    _mono_ns = time.monotonic_ns
+except AttributeError:
+    def _mono_ns():
+        return int(time.monotonic() * 1000000000)
+
+SEGMENTS = ("uart", "hand", "tx", "body", "total")
+
+
+def now_ms() -> int:
+    return _mono_ns() // 1000000
+
+
+def _days_from_civil(y: int, m: int, d: int) -> int:
+    # Days since 1970-01-01 (proleptic Gregorian); avoids time.mktime() timezone quirks
+    if m <= 2:
+        y -= 1
+    era = (y if y >= 0 else y - 399) // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def rtc_payload_to_epoch_ms(payload: bytes) -> int:
+    """
+    BM_SERIAL_RTC_SET payload (bm_serial_time_t, packed, LE):
+      year u16, month u8, day u8, hour u8, minute u8, second u8, ms u32
+    """
+    if len(payload) < 11:
+        raise ValueError("short RTC payload")
+    year = payload[0] | (payload[1] << 8)
+    month, day, hour, minute, second = payload[2], payload[3], payload[4], payload[5], payload[6]
+    ms = int.from_bytes(payload[7:11], "little")
+    days = _days_from_civil(year, month, day)
+    return ((days * 24 + hour) * 60 + minute) * 60000 + second * 1000 + ms
+
+
+class PhaseTimer:
+    """
+    Boot phase timing: mark("fs"), mark("config"), ... then report().
+    Local ms on CircuitPython count from power-on, so report() also gives
+    the absolute time the last phase finished.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = self._last = now_ms()
+        self.phases = []
+
+    def mark(self, name: str) -> int:
+        t = now_ms()
+        dt = t - self._last
+        self.phases.append((name, dt))
+        self._last = t
+        return dt
+
+    def report(self) -> str:
+        parts = ["%s=%d" % p for p in self.phases]
+        return "boot %s total=%d ms (at +%d ms)" % (" ".join(parts), self._last - self.t0, self._last)
+
+
+class RollingPercentiles:
+    """Fixed-size ring of u16 samples (ms, clamped); percentiles on demand."""
+
+    def __init__(self, size: int = 64) -> None:
+        self._buf = array("H", bytes(2 * size))
+        self._i = 0
+        self.n = 0
+
+    def add(self, v: int) -> None:
+        if v < 0:
+            v = 0
+        elif v > 0xFFFF:
+            v = 0xFFFF
+        self._buf[self._i] = v
+        self._i = (self._i + 1) % len(self._buf)
+        if self.n < len(self._buf):
+            self.n += 1
+
+    def percentiles(self, ps=(50, 90, 99)):
+        if not self.n:
+            return [0 for _ in ps]
+        s = sorted(self._buf[:self.n])
+        return [s[min(self.n - 1, (p * self.n) // 100)] for p in ps]
+
+
+class Tracer:
+    def __init__(self, window: int = 64, max_topics: int = 8) -> None:
+        """
+        window    : samples kept per topic and segment for percentiles
+        max_topics: topics tracked for stats (later topics are traced but not aggregated)
+        """
+        self.window = window
+        self.max_topics = max_topics
+        self.offset_ms = None   # epoch_ms - local ms, set by sync_rtc()
+        self.stats = {}         # topic -> {segment: RollingPercentiles}
+        self._seq = 0
+        self._rx = None         # pending burst arrival
+        self.active = False
+        self.topic = None
+        self.id = 0
+        self.t_rx = self.t_d = self.t_q = self.t_w = self.t_h = None
+
+    # -------- Clock --------
+
+    def sync_rtc(self, payload: bytes) -> None:
+        """
+        Sync the local clock from a BM_SERIAL_RTC_SET payload. The reference is
+        the burst's first byte (on_rx), not dispatch, which comes after the RX
+        idle gap and would bias every rx= stamp early by that much.
+        """
+        t = self._rx if self._rx is not None else now_ms()
+        self._rx = None
+        self.offset_ms = rtc_payload_to_epoch_ms(payload) - t
+
+    def epoch_ms(self, local_ms: int):
+        return None if self.offset_ms is None else local_ms + self.offset_ms
+
+    # -------- Hooks (called by BristlemouthSerial) --------
+
+    def on_rx(self) -> None:
+        self._rx = now_ms()
+
+    def begin(self, topic: str) -> None:
+        t = now_ms()
+        self._seq = (self._seq + 1) & 0xFFFF
+        self.id = self._seq
+        self.topic = topic
+        self.t_rx = self._rx if self._rx is not None else t
+        self.t_d = t
+        self.t_q = self.t_w = self.t_h = None
+        self.active = True
+
+    def on_tx_done(self) -> None:
+        # Only the first write after stamp() is the ACK being traced
+        if self.active and self.t_q is not None and self.t_w is None:
+            self.t_w = now_ms()
+
+    def end(self) -> None:
+        if not self.active:
+            return
+        self.t_h = now_ms()
+        self.active = False
+        self._rx = None
+        self._record()
+
+    # -------- Handler side --------
+
+    def stamp(self) -> str:
+        """
+        Mark the ACK as queued and return the suffix to append to it;
+        "" outside of a traced dispatch.
+        """
+        if not self.active:
+            return ""
+        t = now_ms()
+        if self.t_q is None:
+            self.t_q = t  # stats follow the first ACK of a dispatch
+        rx = self.epoch_ms(self.t_rx)
+        return " [t=%04x %s=%d d=%d q=%d]" % (
+            self.id,
+            "rxm" if rx is None else "rx",
+            self.t_rx if rx is None else rx,
+            self.t_d - self.t_rx,
+            t - self.t_rx,
+        )
+
+    # -------- Stats --------
+
+    def _record(self) -> None:
+        st = self.stats.get(self.topic)
+        if st is None:
+            if len(self.stats) >= self.max_topics:
+                return
+            st = {}
+            for seg in SEGMENTS:
+                st[seg] = RollingPercentiles(self.window)
+            self.stats[self.topic] = st
+        st["uart"].add(self.t_d - self.t_rx)
+        st["body"].add(self.t_h - self.t_d)
+        st["total"].add(self.t_h - self.t_rx)
+        if self.t_q is not None:
+            st["hand"].add(self.t_q - self.t_d)
+            if self.t_w is not None:
+                st["tx"].add(self.t_w - self.t_q)
+
+    def report(self, topic: str = None) -> list:
+        """
+        One line per topic: "<topic> n=<count> uart=p50/p90/p99 hand=... ms".
+        """
+        lines = []
+        for t in ([topic] if topic is not None else sorted(self.stats)):
+            st = self.stats.get(t)
+            if st is None:
+                continue
+            parts = [t, "n=%d" % st["total"].n]
+            for seg in SEGMENTS:
+                parts.append("%s=%d/%d/%d" % ((seg,) + tuple(st[seg].percentiles())))
+            lines.append(" ".join(parts) + " ms")
+        return lines
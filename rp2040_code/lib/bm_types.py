@@ -0,0 +1,40 @@
+# /lib/bm_types.py — BM serial message type constants (align with Pi implementation)
+# Split out of bm_serial.py so nodes that only SUB/PUB don't carry the table.
+try:
+    from micropython import const
+except ImportError:  # CPython (host-side tools)
+    def const(x):
+        return x
+
+BM_SERIAL_DEBUG = const(0x00)
+BM_SERIAL_ACK = const(0x01)
+BM_SERIAL_PUB = const(0x02)
+BM_SERIAL_SUB = const(0x03)
+BM_SERIAL_UNSUB = const(0x04)
+BM_SERIAL_LOG = const(0x05)
+BM_SERIAL_NET_MSG = const(0x06)
+BM_SERIAL_RTC_SET = const(0x07)
+BM_SERIAL_SELF_TEST = const(0x08)
+BM_SERIAL_NETWORK_INFO = const(0x09)
+BM_SERIAL_REBOOT_INFO = const(0x0A)
+BM_SERIAL_DFU_START = const(0x30)
+BM_SERIAL_DFU_CHUNK = const(0x31)
+BM_SERIAL_DFU_RESULT = const(0x32)
+BM_SERIAL_CFG_GET = const(0x40)
+BM_SERIAL_CFG_SET = const(0x41)
+BM_SERIAL_CFG_VALUE = const(0x42)
+BM_SERIAL_CFG_COMMIT = const(0x43)
+BM_SERIAL_CFG_STATUS_REQ = const(0x44)
+BM_SERIAL_CFG_STATUS_RESP = const(0x45)
+BM_SERIAL_CFG_DEL_REQ = const(0x46)
+BM_SERIAL_CFG_DEL_RESP = const(0x47)
+BM_SERIAL_CFG_CLEAR_REQ = const(0x48)
+BM_SERIAL_CFG_CLEAR_RESP = const(0x49)
+BM_SERIAL_DEVICE_INFO_REQ = const(0x50)
+BM_SERIAL_DEVICE_INFO_REPLY = const(0x51)
+BM_SERIAL_RESOURCE_REQ = const(0x52)
+BM_SERIAL_RESOURCE_REPLY = const(0x53)
+BM_SERIAL_NODE_ID_REQ = const(0x60)
+BM_SERIAL_NODE_ID_REPLY = const(0x61)
+BM_SERIAL_BAUD_RATE_REQ = const(0x70)
+BM_SERIAL_BAUD_RATE_REPLY = const(0x71)
@@ -0,0 +1,76 @@
+# log_check.py — host-side (Linux, CPython 3) check of lib/bm_log.py
+# Floods the logger with DEBUG records between INFO "ACK" lines (what
+# json_testing.py does with DEBUG_REPL = True) and checks that every ACK still
+# reaches spotter/fprintf, that DEBUG never does, and that dropped counts only
+# bus records that were really lost.
+#
+#   python3 log_check.py            (from rp2040_code/)
+#
+# Exits non-zero if any check fails.
+import sys
+
+sys.path.insert(0, "lib")
+from bm_log import BMLogger, DEBUG, INFO
+
+# -------------------- Settings --------------------
+CAPACITY = 32
+COMMANDS = 12           # within one flush interval
+DEBUG_PER_COMMAND = 3
+
+# -------------------- Fake bus --------------------
+class FakeBM:
+    def __init__(self):
+        self.lines = []
+
+    def spotter_log(self, filename, data):
+        self.lines.extend(data.split("\n"))
+
+# -------------------- Checks ----------------------
+failures = []
+
+def check(ok, msg):
+    print(("PASS " if ok else "FAIL ") + msg)
+    if not ok:
+        failures.append(msg)
+
+def log_commands(log, n):
+    for c in range(n):
+        for d in range(DEBUG_PER_COMMAND):
+            log.debug("[RX] command %d debug %d", c, d)
+        log.info("[ACK] command %d", c)
+
+def check_debug_flood():
+    bm = FakeBM()
+    log = BMLogger(bm, level=DEBUG, capacity=CAPACITY, bus_level=INFO)
+    log_commands(log, COMMANDS)
+    log.flush(max_frames=CAPACITY)
+    acks = [l for l in bm.lines if "[ACK]" in l]
+    check(len(acks) == COMMANDS, "[flood] %d/%d ACKs sent after a DEBUG flood" % (len(acks), COMMANDS))
+    check(all("command %d" % c in acks[c] for c in range(len(acks))), "[flood] ACKs sent in order")
+    check(not any(" D " in l for l in bm.lines), "[flood] no DEBUG records on the bus")
+    check(log.dropped == 0, "[flood] dropped=%d" % log.dropped)
+
+    dumped = []
+    log.dump(out=dumped.append)
+    times = [float(l.split(" ", 1)[0]) for l in dumped if not l.startswith("[bm_log]")]
+    check(any(" D " in l for l in dumped) and times == sorted(times), "[flood] dump() has DEBUG, oldest first")
+
+def check_overflow():
+    bm = FakeBM()
+    log = BMLogger(bm, level=DEBUG, capacity=CAPACITY, bus_level=INFO)
+    extra = 5
+    log_commands(log, CAPACITY + extra)
+    log.flush(max_frames=CAPACITY)
+    acks = [l for l in bm.lines if "[ACK]" in l]
+    check(len(acks) == CAPACITY, "[overflow] %d ACKs sent (ring holds %d)" % (len(acks), CAPACITY))
+    check(log.dropped == extra, "[overflow] dropped=%d counts only lost ACKs (%d)" % (log.dropped, extra))
+
+def main():
+    check_debug_flood()
+    check_overflow()
+    if failures:
+        print("%d check(s) failed" % len(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+main()
@@ -0,0 +1,78 @@
+# replay_bench.py — host-side (Linux, CPython 3) replay of a BM UART capture
+# Feeds a capture made with bm_capture.CaptureWriter back through
+# BristlemouthSerial.bristlemouth_process() and reports parser/dispatch
+# throughput, so the same field trace can be compared across library changes.
+#
+#   python3 replay_bench.py capture.bmcap               (max speed)
+#   python3 replay_bench.py capture.bmcap --speed 1     (real time)
+#   python3 replay_bench.py --synthetic synth.bmcap     (write a synthetic trace)
+import argparse
+import struct
+import sys
+import time
+
+sys.path.insert(0, "lib")
+from bm_serial import BristlemouthSerial
+from bm_capture import CaptureWriter, ReplayUART, replay, REC_RX, REC_RX_END
+
+
+def raw_pub(topic: bytes, data: bytes, node_id: int = 0x8C67D48B8E0A985E) -> bytes:
+    # RAW RX frame as delivered by the mote: [type, 0, crc lo, crc hi] + PUB payload
+    return (bytes((0x02, 0x00, 0x00, 0x00)) + node_id.to_bytes(8, "little") + b"\x00\x00"
+            + struct.pack("<H", len(topic)) + topic + data)
+
+
+def write_synthetic(path: str, n: int = 2000) -> None:
+    """Bursty PUBs, merged frames and long payloads, split into UART-sized chunks."""
+    w = CaptureWriter(path, append=False)
+    for i in range(n):
+        if i % 50 < 10:
+            gap_us = 2000          # burst of back-to-back commands
+        else:
+            gap_us = 250000
+        if i % 7 == 0:
+            frame = raw_pub(b"device/config/set", b'{"sd_high_hz":%d,"tx_low_hz":0.9}' % (i % 100))
+        elif i % 11 == 0:
+            frame = raw_pub(b"device/led", b"x" * 900)   # long payload
+        else:
+            frame = raw_pub(b"device/led", b'{"led":"on"}')
+        if i % 13 == 0:
+            frame += raw_pub(b"device/config/get", b"{}")  # two frames merged in one burst
+        for off in range(0, len(frame), 64):
+            w.record(REC_RX, frame[off:off + 64], dt_us=gap_us if off == 0 else 500)
+        w.record(REC_RX_END, dt_us=0)
+    w.close()
+    print("wrote %d bursts (%d records) to %s" % (n, w.records, path))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("capture")
+    ap.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = max speed")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--synthetic", action="store_true", help="write a synthetic capture and exit")
+    args = ap.parse_args()
+
+    if args.synthetic:
+        write_synthetic(args.capture)
+        return
+
+    bm = BristlemouthSerial(uart=ReplayUART())
+    dispatched = [0]
+
+    def on_pub(node_id, msg_type, version, topic_len, topic, data_len, data):
+        dispatched[0] += 1
+
+    bm.bristlemouth_tap(on_pub)
+
+    for run in range(args.repeat):
+        dispatched[0] = 0
+        r = replay(args.capture, bm, speed=args.speed)
+        busy = r["busy_s"] or 1e-9
+        print("run %d: %d bursts, %d dispatched, %d B in %.3f s busy / %.3f s wall "
+              "-> %.0f bursts/s, %.1f kB/s, max lag %.1f ms"
+              % (run, r["bursts"], dispatched[0], r["rx_bytes"], r["busy_s"], r["wall_s"],
+                 r["bursts"] / busy, r["rx_bytes"] / busy / 1000, r["max_lag_s"] * 1000))
+
+
+main()
@@ -0,0 +1,94 @@
+# sampling_bench.py — host-side (Linux, CPython 3) check of lib/bm_sample.py
+# Runs the sampling pipeline against a synthetic sensor and checks timing
+# jitter, sustained sample rate, the aggregated stats and a runtime rate switch.
+#
+#   python3 sampling_bench.py            (from rp2040_code/)
+#
+# Exits non-zero if any check fails.
+import math
+import sys
+import time
+
+sys.path.insert(0, "lib")
+from bm_sample import SamplingPipeline, unpack_summary
+
+# -------------------- Settings --------------------
+CFG = {
+    "sd_high_hz": 100,
+    "sd_low_hz": 20,
+    "tx_high_hz": 2,
+    "tx_low_hz": 1,
+    "imu_enabled": True,
+}
+RUN_S = 3.0
+MAX_RATE_ERR = 0.01        # sustained rate within 1 % of sd_hz
+MAX_JITTER_P99_MS = 2.0    # 99th percentile |interval - period|
+
+# -------------------- Synthetic sensor ------------
+read_ns = []
+values = []
+
+def synthetic_sensor():
+    t = time.monotonic_ns()
+    read_ns.append(t)
+    v = math.sin(t / 1e9 * 2 * math.pi * 0.5) + 0.01 * (len(values) % 7)
+    values.append(v)
+    return v
+
+summaries = []
+
+def on_tx(payload):
+    summaries.append(bytes(payload))
+
+# -------------------- Checks ----------------------
+failures = []
+
+def check(ok, msg):
+    print(("PASS " if ok else "FAIL ") + msg)
+    if not ok:
+        failures.append(msg)
+
+def run_phase(pipe, mode):
+    pipe.set_mode(mode)
+    read_ns.clear(); values.clear(); summaries.clear()
+    pipe.run_for(RUN_S)
+
+    hz = pipe.sd_hz
+    n = len(read_ns)
+    rate = (n - 1) / ((read_ns[-1] - read_ns[0]) / 1e9)
+    period_ms = 1000.0 / hz
+    jitter = sorted(abs((b - a) / 1e6 - period_ms) for a, b in zip(read_ns, read_ns[1:]))
+    p99 = jitter[int(0.99 * (len(jitter) - 1))]
+
+    print("[%s] %d samples, %.2f Hz (target %.2f), jitter p50=%.3f p99=%.3f max=%.3f ms, "
+          "max late=%.3f ms, skipped=%d, %d summaries"
+          % (mode, n, rate, hz, jitter[len(jitter) // 2], p99, jitter[-1],
+             pipe.max_late_ns / 1e6, pipe.clock.skipped, len(summaries)))
+
+    check(abs(rate - hz) / hz <= MAX_RATE_ERR, "[%s] sustained rate %.2f Hz" % (mode, rate))
+    check(p99 <= MAX_JITTER_P99_MS, "[%s] jitter p99 %.3f ms" % (mode, p99))
+
+    # Every summary must match stats recomputed from the raw synthetic values
+    dec = pipe.decimation
+    check(len(summaries) == n // dec, "[%s] %d summaries for decimation %d" % (mode, len(summaries), dec))
+    ok = True
+    for i, payload in enumerate(summaries):
+        seq, smode, count, ((mn, mx, mean, var),) = unpack_summary(payload)
+        chunk = values[i * dec:(i + 1) * dec]
+        m = sum(chunk) / len(chunk)
+        v = sum((x - m) ** 2 for x in chunk) / len(chunk)
+        ok &= smode == mode and count == dec
+        ok &= abs(mn - min(chunk)) < 1e-5 and abs(mx - max(chunk)) < 1e-5
+        ok &= abs(mean - m) < 1e-5 and abs(var - v) < 1e-5
+    check(ok, "[%s] summary min/max/mean/variance match" % mode)
+
+def main():
+    pipe = SamplingPipeline(synthetic_sensor, CFG, tx_fn=on_tx)
+    run_phase(pipe, "high")
+    run_phase(pipe, "low")
+    if failures:
+        print("%d check(s) failed" % len(failures))
+        sys.exit(1)
+    print("all checks passed")
+
+main()